@@ -15,18 +15,32 @@ import pytz
 from pytz import all_timezones_set
 
 from enum import Enum
-from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import NamedTuple
+from datetime import datetime, tzinfo
 from superdesk.resource import Resource
 from superdesk.services import BaseService
 from superdesk.errors import SuperdeskApiError
 from eve.utils import config
-from superdesk.utc import set_time
 from flask_babel import _
 
 from .rule_handlers import get_routing_rule_handler
 
 logger = logging.getLogger(__name__)
 
+_UTC = pytz.utc
+
+_ALLOWED_RULE_FIELDS = frozenset({"name", "handler", "filter", "actions", "schedule"})
+
+
+@lru_cache(maxsize=128)
+def _get_tz(name):
+    """Get timezone object for given name, falling back to UTC if not set.
+
+    :param str name: time zone name, eg. Europe/Prague
+    """
+    return pytz.timezone(name) if name else _UTC
+
 
 class Weekdays(Enum):
     """Weekdays names we use for scheduling."""
@@ -45,7 +59,7 @@ class Weekdays(Enum):
 
         :param list list_of_days eg. ['mon', 'tue', 'fri']
         """
-        return all([day.upper() in cls.__members__ for day in list_of_days])
+        return _is_valid_schedule(list_of_days)
 
     @classmethod
     def is_scheduled_day(cls, today, list_of_days):
@@ -54,7 +68,15 @@ class Weekdays(Enum):
         :param datetime today
         :param list list_of_days
         """
-        return today.weekday() in [cls[day.upper()].value for day in list_of_days]
+        return _is_scheduled_day(today, list_of_days)
+
+    @classmethod
+    def weekday_ints(cls, list_of_days):
+        """Get weekday numbers (as returned by datetime.weekday) for given day names.
+
+        :param list list_of_days eg. ['mon', 'tue', 'fri']
+        """
+        return _weekday_ints(list_of_days)
 
     @classmethod
     def dayname(cls, day):
@@ -62,7 +84,90 @@ class Weekdays(Enum):
 
         :param datetime day
         """
-        return cls(day.weekday()).name
+        return _WEEKDAY_NAMES[day.weekday()]
+
+
+# enum members lookup is slow, use plain dict and tuple for hot paths
+_WEEKDAY_VALUES = {name: member.value for name, member in Weekdays.__members__.items()}
+_WEEKDAY_NAMES = tuple(member.name for member in sorted(Weekdays, key=lambda member: member.value))
+
+
+def _is_valid_schedule(list_of_days):
+    return all(day.upper() in _WEEKDAY_VALUES for day in list_of_days)
+
+
+def _is_scheduled_day(today, list_of_days):
+    return today.weekday() in _weekday_ints(list_of_days)
+
+
+def _weekday_ints(list_of_days):
+    return frozenset(_WEEKDAY_VALUES[day.upper()] for day in list_of_days)
+
+
+class CompiledSchedule(NamedTuple):
+    """Routing rule schedule parsed once so it can be matched against many items."""
+
+    tz: tzinfo
+    from_seconds: int
+    to_seconds: int
+    weekday_mask: int  # bit n set if schedule includes weekday n
+
+
+@lru_cache(maxsize=256)
+def _parse_time(value):
+    """Parse time of day in `%H:%M:%S` format, eg. 10:14:00.
+
+    :param str value: time of day
+    :rtype: datetime.time
+    """
+    return datetime.strptime(value, "%H:%M:%S").time()
+
+
+def _seconds_of_day(value):
+    """Get number of seconds since midnight for given time or datetime."""
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _compile_schedule(schedule):
+    """Get compiled version of given routing rule schedule.
+
+    Compiled schedules are cached by schedule values, so it's parsed only once
+    for all ingested items.
+
+    :param dict schedule: routing rule schedule
+    """
+    return _compile_schedule_values(
+        schedule.get("time_zone"),
+        schedule.get("hour_of_day_from"),
+        schedule.get("hour_of_day_to"),
+        tuple(schedule.get("day_of_week") or ()),
+    )
+
+
+@lru_cache(maxsize=256)
+def _compile_schedule_values(tz_name, hour_of_day_from, hour_of_day_to, day_of_week):
+    # If start time is not defined, the beginning of the day is assumed. If end time
+    # is not defined, the end of the day is assumed (excluding the midnight, since
+    # at that point a new day has already begun).
+    from_time = _parse_time(hour_of_day_from or "00:00:00")
+    to_time = _parse_time(hour_of_day_to or "23:59:59")
+    to_seconds = _seconds_of_day(to_time)
+    if not hour_of_day_to or hour_of_day_to[-2:] == "00":
+        to_seconds += 60
+    return CompiledSchedule(
+        tz=_get_tz(tz_name),
+        from_seconds=_seconds_of_day(from_time),
+        to_seconds=to_seconds,
+        weekday_mask=sum(1 << weekday for weekday in _weekday_ints(day_of_week)),
+    )
+
+
+def _get_rule_schedules(rules):
+    """Get (rule, compiled schedule) pairs for given rules, schedule is None for rules without one.
+
+    :param list rules: routing rules
+    """
+    return [(rule, _compile_schedule(rule["schedule"]) if rule.get("schedule") else None) for rule in rules]
 
 
 class RoutingRuleSchemeResource(Resource):
@@ -169,9 +274,13 @@ class RoutingRuleSchemeService(BaseService):
             1. A routing scheme must have at least one rule.
             2. Every rule in the routing scheme must have name, filter and at least one action
 
+        Rules are only validated if they were changed.
+
         Will throw BadRequestError if any of the pre-conditions fail.
         """
         self._adjust_for_empty_schedules(updates)
+        if "rules" not in updates or updates["rules"] == original.get("rules"):
+            return
         self._validate_routing_scheme(updates)
         self._check_if_rule_name_is_unique(updates)
 
@@ -194,48 +303,81 @@ class RoutingRuleSchemeService(BaseService):
         :param routing_scheme: routing scheme.
         """
         rules = routing_scheme.get("rules", [])
+        scheme_name = routing_scheme.get("name")
+        ingest_guid = ingest_item.get("guid")
+        ingest_id = ingest_item[config.ID_FIELD]
+        provider_name = provider.get("name")
+
         if not rules:
-            logger.warning(
-                "Routing Scheme % for provider % has no rules configured."
-                % (provider.get("name"), routing_scheme.get("name"))
-            )
+            logger.warning("Routing Scheme %s for provider %s has no rules configured.", scheme_name, provider_name)
 
         filters_service = superdesk.get_resource_service("content_filters")
 
-        now = datetime.utcnow()
+        now = datetime.now(_UTC)
+        filter_matches = {}
 
         for rule in self._get_scheduled_routing_rules(rules, now):
+            rule_name = rule.get("name")
             content_filter = rule.get("filter", {})
             logger.info(
-                "Applying rule. Item: %s . Routing Scheme: %s. Rule Name %s."
-                % (ingest_item.get("guid"), routing_scheme.get("name"), rule.get("name"))
+                "Applying rule. Item: %s . Routing Scheme: %s. Rule Name %s.",
+                ingest_guid,
+                scheme_name,
+                rule_name,
             )
 
             rule_handler = get_routing_rule_handler(rule)
             if not rule_handler.can_handle(rule, ingest_item, routing_scheme):
                 logger.info(
-                    "Routing rule %s of Routing Scheme %s for Provider %s does not support item %s"
-                    % (rule.get("name"), routing_scheme.get("name"), provider.get("name"), ingest_item[config.ID_FIELD])
+                    "Routing rule %s of Routing Scheme %s for Provider %s does not support item %s",
+                    rule_name,
+                    scheme_name,
+                    provider_name,
+                    ingest_id,
                 )
-            elif filters_service.does_match(content_filter, ingest_item):
+            elif self._does_filter_match(filters_service, content_filter, ingest_item, filter_matches):
                 logger.info(
-                    "Filter matched. Item: %s. Routing Scheme: %s. Rule Name %s."
-                    % (ingest_item.get("guid"), routing_scheme.get("name"), rule.get("name"))
+                    "Filter matched. Item: %s. Routing Scheme: %s. Rule Name %s.",
+                    ingest_guid,
+                    scheme_name,
+                    rule_name,
                 )
 
                 rule_handler.apply_rule(rule, ingest_item, routing_scheme)
-                if rule.get("actions", {}).get("exit", False):
+                if (rule.get("actions") or {}).get("exit", False):
                     logger.info(
-                        "Exiting routing scheme. Item: %s . Routing Scheme: %s. "
-                        "Rule Name %s." % (ingest_item.get("guid"), routing_scheme.get("name"), rule.get("name"))
+                        "Exiting routing scheme. Item: %s . Routing Scheme: %s. Rule Name %s.",
+                        ingest_guid,
+                        scheme_name,
+                        rule_name,
                     )
                     break
             else:
                 logger.info(
-                    "Routing rule %s of Routing Scheme %s for Provider %s did not match for item %s"
-                    % (rule.get("name"), routing_scheme.get("name"), provider.get("name"), ingest_item[config.ID_FIELD])
+                    "Routing rule %s of Routing Scheme %s for Provider %s did not match for item %s",
+                    rule_name,
+                    scheme_name,
+                    provider_name,
+                    ingest_id,
                 )
 
+    def _does_filter_match(self, filters_service, content_filter, ingest_item, filter_matches):
+        """Test if content filter matches the ingest item.
+
+        Results are stored in `filter_matches` by filter id, so the filter is
+        evaluated only once if it's used by multiple rules.
+
+        :param dict content_filter: content filter embedded in routing rule
+        :param dict ingest_item: ingest item
+        :param dict filter_matches: filter id to match result mapping
+        """
+        filter_id = content_filter.get(config.ID_FIELD) if isinstance(content_filter, dict) else None
+        if filter_id is None:
+            return filters_service.does_match(content_filter, ingest_item)
+        if filter_id not in filter_matches:
+            filter_matches[filter_id] = filters_service.does_match(content_filter, ingest_item)
+        return filter_matches[filter_id]
+
     def _adjust_for_empty_schedules(self, routing_scheme):
         """Adjust for empty schedules.
 
@@ -259,9 +401,9 @@ class RoutingRuleSchemeService(BaseService):
         for rule in routing_scheme.get("rules", []):
             schedule = rule.get("schedule")
             if schedule:
-                if set(schedule.keys()) == {"time_zone"}:
+                if len(schedule) == 1 and "time_zone" in schedule:
                     rule["schedule"] = None
-                elif "time_zone" not in schedule.keys():
+                elif "time_zone" not in schedule:
                     schedule["time_zone"] = "UTC"
 
     def _validate_routing_scheme(self, routing_scheme):
@@ -279,15 +421,11 @@ class RoutingRuleSchemeService(BaseService):
         if len(routing_rules) == 0:
             raise SuperdeskApiError.badRequestError(message=_("A Routing Scheme must have at least one Rule"))
         for routing_rule in routing_rules:
-            invalid_fields = [
-                field
-                for field in routing_rule.keys()
-                if field not in ("name", "handler", "filter", "actions", "schedule")
-            ]
+            invalid_fields = routing_rule.keys() - _ALLOWED_RULE_FIELDS
 
             if invalid_fields:
                 raise SuperdeskApiError.badRequestError(
-                    message=_("A routing rule has invalid fields {fields}").format(fields=invalid_fields)
+                    message=_("A routing rule has invalid fields {fields}").format(fields=sorted(invalid_fields))
                 )
 
             schedule = routing_rule.get("schedule")
@@ -320,19 +458,19 @@ class RoutingRuleSchemeService(BaseService):
             raise SuperdeskApiError.badRequestError(message=_("Schedule when defined can't be empty."))
 
         if schedule:
-            if not Weekdays.is_valid_schedule(schedule.get("day_of_week", [])):
+            if not _is_valid_schedule(schedule.get("day_of_week", [])):
                 raise SuperdeskApiError.badRequestError(message=_("Invalid values for day of week."))
 
             if schedule.get("hour_of_day_from") or schedule.get("hour_of_day_to"):
                 try:
-                    from_time = datetime.strptime(schedule.get("hour_of_day_from"), "%H:%M:%S")
+                    from_time = _parse_time(schedule.get("hour_of_day_from"))
                 except Exception:
                     raise SuperdeskApiError.badRequestError(message=_("Invalid value for from time."))
 
                 to_time = schedule.get("hour_of_day_to", "")
                 if to_time:
                     try:
-                        to_time = datetime.strptime(to_time, "%H:%M:%S")
+                        to_time = _parse_time(to_time)
                     except Exception:
                         raise SuperdeskApiError.badRequestError(
                             message=_("Invalid value for hour_of_day_to (expected %H:%M:%S).")
@@ -351,13 +489,12 @@ class RoutingRuleSchemeService(BaseService):
         """
         Checks if name of a routing rule is unique or not.
         """
-        routing_rules = routing_scheme.get("rules", [])
-
-        for routing_rule in routing_rules:
-            rules_with_same_name = [rule for rule in routing_rules if rule.get("name") == routing_rule.get("name")]
-
-            if len(rules_with_same_name) > 1:
+        names = set()
+        for routing_rule in routing_scheme.get("rules", []):
+            name = routing_rule.get("name")
+            if name in names:
                 raise SuperdeskApiError.badRequestError(_("Rule Names must be unique within a scheme"))
+            names.add(name)
 
     def _get_scheduled_routing_rules(self, rules, current_dt_utc):
         """
@@ -370,44 +507,26 @@ class RoutingRuleSchemeService(BaseService):
         :return: the rules scheduled to be appplied at `current_dt_utc`
         :rtype: list
         """
-        # make it a timezone-aware object
-        current_dt_utc = current_dt_utc.replace(tzinfo=pytz.utc)
-        delta_minute = timedelta(minutes=1)
+        if current_dt_utc.tzinfo is None:  # make it a timezone-aware object
+            current_dt_utc = current_dt_utc.replace(tzinfo=_UTC)
 
+        now_by_tz = {}
         scheduled_rules = []
-        for rule in rules:
-            is_scheduled = True
-            schedule = rule.get("schedule", {})
-            if schedule:
-                # adjust current time to the schedule's timezone
-                tz_name = schedule.get("time_zone")
-                schedule_tz = pytz.timezone(tz_name) if tz_name else pytz.utc
-                now_tz_schedule = current_dt_utc.astimezone(tz=schedule_tz)
-
-                # Create start and end time-of-day limits. If start time is not
-                # defined, the beginning of the day is assumed. If end time
-                # is not defined, the end of the day is assumed (excluding the
-                # midnight, since at that point a new day has already begun).
-                hour_of_day_from = schedule.get("hour_of_day_from")
-                if not hour_of_day_from:
-                    hour_of_day_from = "00:00:00"  # might be both '' or None
-                from_time = set_time(now_tz_schedule, hour_of_day_from)
-
-                hour_of_day_to = schedule.get("hour_of_day_to")
-                if hour_of_day_to:
-                    to_time = set_time(now_tz_schedule, hour_of_day_to)
-                    if hour_of_day_to[-2:] == "00":
-                        to_time = to_time + delta_minute
-                else:
-                    to_time = set_time(now_tz_schedule, "23:59:59") + delta_minute
-
-                # check if the current day of week and time of day both match
-                day_of_week_matches = Weekdays.is_scheduled_day(now_tz_schedule, schedule.get("day_of_week", []))
-                time_of_day_matches = from_time <= now_tz_schedule < to_time
-
-                is_scheduled = day_of_week_matches and time_of_day_matches
-
-            if is_scheduled:
+        for rule, compiled in _get_rule_schedules(rules):
+            if compiled is None:  # rule without schedule is always applied
+                scheduled_rules.append(rule)
+                continue
+
+            # adjust current time to the schedule's timezone, rules often share it
+            now_tz_schedule = now_by_tz.get(compiled.tz)
+            if now_tz_schedule is None:
+                now_tz_schedule = now_by_tz[compiled.tz] = current_dt_utc.astimezone(tz=compiled.tz)
+
+            # check if the current day of week and time of day both match
+            day_of_week_matches = compiled.weekday_mask >> now_tz_schedule.weekday() & 1
+            time_of_day_matches = compiled.from_seconds <= _seconds_of_day(now_tz_schedule) < compiled.to_seconds
+
+            if day_of_week_matches and time_of_day_matches:
                 scheduled_rules.append(rule)
 
         return scheduled_rules
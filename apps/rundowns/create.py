@@ -1,5 +1,7 @@
 import superdesk
 
+from functools import lru_cache
+
 from . import privileges, SCOPE
 
 from flask import current_app as app
@@ -7,6 +9,16 @@ from eve.methods.common import document_link
 from superdesk.utc import utcnow, utc_to_local
 
 
+@lru_cache(maxsize=64)
+def _get_headline_formatter(prefix, separator, date_format):
+    """Get function generating rundown headline for given date."""
+
+    def format_headline(date):
+        return " ".join(part for part in (prefix, separator, date.strftime(date_format)) if part)
+
+    return format_headline
+
+
 class FromTemplateResource(superdesk.Resource):
     schema = {
         "template": superdesk.Resource.rel("rundown_templates", required=True),
@@ -27,8 +39,13 @@ class FromTemplateResource(superdesk.Resource):
 class FromTemplateService(superdesk.Service):
     def create(self, docs, **kwargs):
         ids = []
+        template_ids = list({doc["template"] for doc in docs})
+        templates = {
+            template["_id"]: template
+            for template in superdesk.get_resource_service("rundown_templates").find({"_id": {"$in": template_ids}})
+        }
         for doc in docs:
-            template = superdesk.get_resource_service("rundown_templates").find_one(req=None, _id=doc["template"])
+            template = templates.get(doc["template"])
             assert template
             rundown = {"scope": SCOPE, "type": "composite", "particular_type": "rundown"}
 
@@ -42,16 +59,13 @@ class FromTemplateService(superdesk.Service):
                     second=int(air_time[2]) if len(air_time) == 3 else 0,
                     microsecond=0,
                 )
-                rundown["headline"] = " ".join(
-                    filter(
-                        bool,
-                        [
-                            template["headline_template"].get("prefix"),
-                            template["headline_template"].get("separator", ""),
-                            date.strftime(template["headline_template"].get("date_format", "")),
-                        ],
-                    )
+                headline_template = template["headline_template"]
+                format_headline = _get_headline_formatter(
+                    headline_template.get("prefix"),
+                    headline_template.get("separator", ""),
+                    headline_template.get("date_format", ""),
                 )
+                rundown["headline"] = format_headline(date)
 
             superdesk.get_resource_service("archive").post([rundown])
             rundown["_links"] = {"self": document_link("archive", rundown["_id"])}
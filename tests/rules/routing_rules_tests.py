@@ -3,7 +3,7 @@ from unittest import mock
 from copy import deepcopy
 from datetime import datetime
 
-from apps.rules.routing_rules import RoutingRuleSchemeService
+from apps.rules.routing_rules import RoutingRuleSchemeService, _compile_schedule, _get_rule_schedules
 from superdesk.errors import SuperdeskApiError
 
 
@@ -105,6 +105,23 @@ class OnUpdateMethodTestCase(RoutingRuleSchemeServiceTest):
 
         self.assertEqual(routing_scheme, expected_scheme)
 
+    def test_skips_validation_if_rules_not_changed(self, check_unique, validate):
+        rules = [{"name": "rule_1", "schedule": None}]
+
+        self.instance.on_update({"name": "scheme_2"}, {"name": "scheme_1", "rules": rules})
+        self.instance.on_update({"rules": deepcopy(rules)}, {"name": "scheme_1", "rules": rules})
+
+        validate.assert_not_called()
+        check_unique.assert_not_called()
+
+    def test_validates_changed_rules(self, check_unique, validate):
+        updates = {"rules": [{"name": "rule_2", "schedule": None}]}
+
+        self.instance.on_update(updates, {"name": "scheme_1", "rules": [{"name": "rule_1", "schedule": None}]})
+
+        validate.assert_called_once_with(updates)
+        check_unique.assert_called_once_with(updates)
+
 
 class ValidateScheduleMethodTestCase(RoutingRuleSchemeServiceTest):
     """Tests for the _validate_schedule() method."""
@@ -136,6 +153,38 @@ class ValidateScheduleMethodTestCase(RoutingRuleSchemeServiceTest):
             self.fail("Unexpected exception on empty hour_of_day_to: {}".format(ex))
 
 
+class CheckIfRuleNameIsUniqueMethodTestCase(RoutingRuleSchemeServiceTest):
+    """Tests for the _check_if_rule_name_is_unique() method."""
+
+    def test_raises_error_on_duplicate_names(self):
+        routing_scheme = {"rules": [{"name": "rule_1"}, {"name": "rule_2"}, {"name": "rule_1"}]}
+
+        with self.assertRaises(SuperdeskApiError):
+            self.instance._check_if_rule_name_is_unique(routing_scheme)
+
+    def test_allows_unique_names(self):
+        routing_scheme = {"rules": [{"name": "rule_1"}, {"name": "rule_2"}]}
+        self.instance._check_if_rule_name_is_unique(routing_scheme)
+
+
+class DoesFilterMatchMethodTestCase(RoutingRuleSchemeServiceTest):
+    """Tests for the _does_filter_match() method."""
+
+    def test_evaluates_shared_filter_once(self):
+        filters_service = mock.Mock()
+        filters_service.does_match.return_value = True
+        content_filter = {"_id": "filter_1", "content_filter": []}
+        item = {"_id": "item_1"}
+        filter_matches = {}
+
+        self.assertTrue(self.instance._does_filter_match(filters_service, content_filter, item, filter_matches))
+        self.assertTrue(self.instance._does_filter_match(filters_service, content_filter, item, filter_matches))
+        self.assertEqual(1, filters_service.does_match.call_count)
+
+        self.instance._does_filter_match(filters_service, None, item, filter_matches)
+        self.assertEqual(2, filters_service.does_match.call_count)
+
+
 class GetScheduledRoutingRulesMethodTestCase(RoutingRuleSchemeServiceTest):
     """Tests for the _get_scheduled_routing_rules() method."""
 
@@ -303,3 +352,37 @@ class GetScheduledRoutingRulesMethodTestCase(RoutingRuleSchemeServiceTest):
         now = datetime(2015, 9, 15, 23, 59, 59, 999999)  # Tuesday
         result = self.instance._get_scheduled_routing_rules(rules, now)
         self.assertEqual(result, [])
+
+
+class CompileScheduleTestCase(unittest.TestCase):
+    """Tests for the _compile_schedule() function."""
+
+    def test_reuses_compiled_schedule_for_same_values(self):
+        schedule = {
+            "day_of_week": ["mon", "FRI"],
+            "hour_of_day_from": "08:00:00",
+            "hour_of_day_to": "18:00:00",
+            "time_zone": "Europe/Prague",
+        }
+
+        compiled = _compile_schedule(schedule)
+
+        self.assertIs(compiled, _compile_schedule(deepcopy(schedule)))
+        self.assertEqual(0b10001, compiled.weekday_mask)
+        self.assertEqual("Europe/Prague", compiled.tz.zone)
+
+
+class GetRuleSchedulesTestCase(unittest.TestCase):
+    """Tests for the _get_rule_schedules() function."""
+
+    def test_pairs_rules_with_compiled_schedules(self):
+        rules = [
+            {"name": "rule_1", "schedule": None},
+            {"name": "rule_2", "schedule": {"day_of_week": ["MON"], "time_zone": "UTC"}},
+        ]
+
+        rule_schedules = _get_rule_schedules(rules)
+
+        self.assertEqual([rule for rule, _ in rule_schedules], rules)
+        self.assertIsNone(rule_schedules[0][1])
+        self.assertEqual(0b1, rule_schedules[1][1].weekday_mask)
@@ -21,3 +21,7 @@ class WeekdaysTestCase(unittest.TestCase):
         now = datetime.now()
         day = now.strftime("%A")[:3].upper()
         self.assertEqual(day, Weekdays.dayname(now))
+
+    def test_weekday_ints(self):
+        self.assertEqual(frozenset([0, 6]), Weekdays.weekday_ints(["mon", "SUN", "Mon"]))
+        self.assertEqual(frozenset(), Weekdays.weekday_ints([]))